@@ -7,8 +7,11 @@ WHY: Without cost tracking, LLM spending is invisible. A single conversation
      - Provider spending breakdown
      - Budget alerts and anomaly detection
      - Per-agent observability (p50, p95, error rate)
-HOW: Global singleton records every call. Aggregation by conversation_id,
-     provider, or agent. Percentile latency calculation for SLO monitoring.
+HOW: Global singleton records every call into a fixed-capacity ring buffer of
+     typed columns (oldest calls are overwritten, so memory stays bounded).
+     Per-conversation, per-provider and per-agent summaries are maintained
+     incrementally over the retained window, so queries are O(1).
+     Streaming latency sketch per agent for SLO percentiles (~1% error).
 
 ADAPTED FROM: job-matchmaker/src/resilience/cost_tracker.py
 AUTHOR: Claude Opus 4.6
@@ -17,11 +20,16 @@ LAST UPDATED: 2026-02-28
 
 from __future__ import annotations
 
+import functools
+import math
 import threading
 import time
-from dataclasses import dataclass, field
+from array import array
+from dataclasses import dataclass, field, replace
+from itertools import count
 
-# Default pricing (per 1K tokens) — override via config at runtime
+# Default pricing (per 1K tokens) — override via config at runtime, then call
+# _resolve_rates.cache_clear() so memoized lookups pick up the new rates
 _DEFAULT_PRICING: dict[str, tuple[float, float]] = {
     # model_prefix: (cost_per_1k_prompt, cost_per_1k_completion)
     "deepseek": (0.00015, 0.00045),
@@ -33,20 +41,39 @@ _DEFAULT_PRICING: dict[str, tuple[float, float]] = {
     "gpt-4o": (0.0025, 0.01),
 }
 
+# Ring buffer size — must be a power of two so `idx & mask` replaces modulo
+_DEFAULT_CAPACITY = 1 << 16
+
+# Latency sketch: relative error bound for reported percentiles
+_SKETCH_ACCURACY = 0.01
+_SKETCH_GAMMA = (1 + _SKETCH_ACCURACY) / (1 - _SKETCH_ACCURACY)
+_SKETCH_INV_LOG_GAMMA = 1 / math.log(_SKETCH_GAMMA)
+_SKETCH_MIDPOINT = 2 / (_SKETCH_GAMMA + 1)  # bucket (gamma^(k-1), gamma^k] -> midpoint estimate
+_SKETCH_ZERO_KEY = -(1 << 62)  # bucket for durations <= 0
+
+
+# Unknown model — conservative default (per 1K tokens)
+_FALLBACK_PRICING: tuple[float, float] = (0.003, 0.015)
+
+
+@functools.lru_cache(maxsize=256)
+def _resolve_rates(model: str) -> tuple[float, float]:
+    """Per-token (prompt, completion) rates for `model`, classified once per model string."""
+    lowered = model.lower()
+    prompt_rate, completion_rate = next(
+        (rates for prefix, rates in _DEFAULT_PRICING.items() if prefix in lowered),
+        _FALLBACK_PRICING,
+    )
+    return prompt_rate * 1e-3, completion_rate * 1e-3
+
 
 def _estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
     """Estimate USD cost based on model and token counts."""
-    for prefix, (prompt_rate, completion_rate) in _DEFAULT_PRICING.items():
-        if prefix in model.lower():
-            return (
-                (prompt_tokens / 1000) * prompt_rate
-                + (completion_tokens / 1000) * completion_rate
-            )
-    # Unknown model — use conservative default
-    return (prompt_tokens / 1000) * 0.003 + (completion_tokens / 1000) * 0.015
+    prompt_rate, completion_rate = _resolve_rates(model)
+    return prompt_tokens * prompt_rate + completion_tokens * completion_rate
 
 
-@dataclass
+@dataclass(slots=True)
 class CallRecord:
     """One LLM API call — immutable after creation."""
 
@@ -63,7 +90,7 @@ class CallRecord:
     timestamp: float = field(default_factory=time.time)
 
 
-@dataclass
+@dataclass(slots=True)
 class CostSummary:
     """Aggregated cost data."""
 
@@ -77,12 +104,16 @@ class CostSummary:
     total_duration_ms: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentObservability:
     """Per-agent observability metrics for monitoring dashboards.
 
     WHY: When the system is slow, you need to know WHICH agent is slow.
          When costs spike, you need to know WHICH agent is burning budget.
+
+    Latencies come from a log-bucket sketch: p50/p95 are within ~1% relative
+    error, and max_latency_ms is the top bucket's upper bound (never below
+    the true max, at most ~2% above it). avg_latency_ms is exact.
     """
 
     agent_name: str
@@ -97,6 +128,66 @@ class AgentObservability:
     max_latency_ms: float = 0.0
 
 
+class _LatencySketch:
+    """Log-bucketed latency histogram (DDSketch-style) for streaming percentiles.
+
+    WHY: Sorting every duration per report is O(N log N). Bucket bounds grow
+         geometrically, so any percentile is within _SKETCH_ACCURACY relative
+         error in O(#buckets). Unlike a t-digest, samples can be removed again
+         when the ring buffer evicts them.
+    """
+
+    __slots__ = ("count", "_buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._buckets: dict[int, int] = {}
+
+    def add(self, value: float, sign: int = 1) -> None:
+        """Insert (sign=1) or remove (sign=-1) one sample."""
+        key = math.ceil(math.log(value) * _SKETCH_INV_LOG_GAMMA) if value > 0 else _SKETCH_ZERO_KEY
+        n = self._buckets.get(key, 0) + sign
+        if n:
+            self._buckets[key] = n
+        else:
+            del self._buckets[key]
+        self.count += sign
+
+    def copy(self) -> _LatencySketch:
+        clone = _LatencySketch()
+        clone.count = self.count
+        clone._buckets = self._buckets.copy()
+        return clone
+
+    def percentiles(self, *pcts: int) -> list[float]:
+        """Nearest-rank percentiles (ascending pcts) in one walk over the sorted buckets.
+
+        Each is reported as its bucket's midpoint estimate.
+        """
+        if not self.count:
+            return [0.0] * len(pcts)
+        ranks = [max(0, min(self.count - 1, int(self.count * pct / 100))) for pct in pcts]
+        out: list[float] = []
+        seen = 0
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen <= ranks[len(out)]:
+                continue
+            value = 0.0 if key == _SKETCH_ZERO_KEY else _SKETCH_MIDPOINT * _SKETCH_GAMMA**key
+            while len(out) < len(ranks) and seen > ranks[len(out)]:
+                out.append(value)
+            if len(out) == len(ranks):
+                break
+        return out
+
+    def upper_bound(self) -> float:
+        """Upper edge of the highest occupied bucket — an upper bound on the max sample."""
+        if not self.count:
+            return 0.0
+        key = max(self._buckets)
+        return 0.0 if key == _SKETCH_ZERO_KEY else _SKETCH_GAMMA**key
+
+
 class CostTracker:
     """Thread-safe LLM cost tracker with per-conversation and per-agent aggregation.
 
@@ -121,9 +212,80 @@ class CostTracker:
         # {"jd_agent": AgentObservability(p95_latency_ms=3200, ...), ...}
     """
 
-    def __init__(self) -> None:
+    def __init__(self, capacity: int = _DEFAULT_CAPACITY) -> None:
+        if capacity <= 0 or capacity & (capacity - 1):
+            raise ValueError(f"capacity must be a power of two, got {capacity}")
         self._lock = threading.Lock()
-        self._records: list[CallRecord] = []
+        self._mask = capacity - 1
+        self._init_columns(capacity)
+
+    def _init_columns(self, capacity: int) -> None:
+        """Allocate the struct-of-arrays ring buffer and running summaries.
+
+        WHY: One typed column per numeric field keeps the window contiguous in
+             memory. String fields are interned to int codes (refcounted, so
+             a code is freed once no retained row uses it); -1 marks an
+             empty slot. Per-key summaries are maintained on record() so
+             queries are O(1) instead of a rescan of the window.
+        """
+        self._prompt_tokens = array("q", bytes(8 * capacity))
+        self._completion_tokens = array("q", bytes(8 * capacity))
+        self._total_tokens = array("q", bytes(8 * capacity))
+        self._cost_usd = array("d", bytes(8 * capacity))
+        self._duration_ms = array("d", bytes(8 * capacity))
+        self._success = array("b", bytes(capacity))
+        self._provider_codes = array("l", [-1]) * capacity
+        self._caller_codes = array("l", [-1]) * capacity
+        self._conversation_codes = array("l", [-1]) * capacity
+        self._codes: dict[str, int] = {}
+        self._names: list[str] = []
+        self._refs: list[int] = []
+        self._free_codes: list[int] = []
+        self._head = count()
+        self._session = CostSummary()
+        self._by_provider: dict[str, CostSummary] = {}
+        self._by_caller: dict[str, CostSummary] = {}
+        self._by_conversation: dict[str, CostSummary] = {}
+        self._latency: dict[str, _LatencySketch] = {}
+        # WHY: CallRecords are not retained (the window lives in the columns),
+        #      so there is nothing to pool. Pair each summary table with its
+        #      code column once here so _apply builds no per-call tuples.
+        self._keyed_summaries = (
+            (self._by_provider, self._provider_codes),
+            (self._by_caller, self._caller_codes),
+            (self._by_conversation, self._conversation_codes),
+        )
+
+    def _intern(self, name: str) -> int:
+        """Return the int code for a provider/caller/conversation string. Caller holds the lock.
+
+        Each call takes one reference; _release drops it when the row is evicted.
+        """
+        code = self._codes.get(name)
+        if code is None:
+            if self._free_codes:
+                code = self._free_codes.pop()
+                self._names[code] = name
+                self._refs[code] = 0
+            else:
+                code = len(self._names)
+                self._names.append(name)
+                self._refs.append(0)
+            self._codes[name] = code
+        self._refs[code] += 1
+        return code
+
+    def _release(self, code: int) -> None:
+        """Drop one reference to `code`, freeing it for reuse at zero. Caller holds the lock.
+
+        WHY: Unique conversation ids would otherwise stay interned forever,
+             long after their rows left the window.
+        """
+        self._refs[code] -= 1
+        if not self._refs[code]:
+            del self._codes[self._names[code]]
+            self._names[code] = ""
+            self._free_codes.append(code)
 
     def record(
         self,
@@ -137,9 +299,23 @@ class CostTracker:
         duration_ms: float = 0.0,
         success: bool = True,
     ) -> CallRecord:
-        """Record a single LLM API call."""
+        """Record a single LLM API call.
+
+        Raises TypeError/ValueError/OverflowError for values the typed columns
+        can't hold — before any slot is taken, so the running totals are untouched.
+        """
+        prompt_tokens = int(prompt_tokens)
+        completion_tokens = int(completion_tokens)
+        duration_ms = float(duration_ms)
+        success = bool(success)
+        if not math.isfinite(duration_ms):
+            raise ValueError(f"duration_ms must be finite, got {duration_ms}")
         total = prompt_tokens + completion_tokens
-        cost = _estimate_cost(model, prompt_tokens, completion_tokens) if success else 0.0
+        # Failed or empty calls (common during outage cascades) skip pricing entirely
+        if success and (prompt_tokens or completion_tokens):
+            cost = _estimate_cost(model, prompt_tokens, completion_tokens)
+        else:
+            cost = 0.0
 
         record = CallRecord(
             provider=provider,
@@ -153,51 +329,80 @@ class CostTracker:
             duration_ms=duration_ms,
             success=success,
         )
+        # WHY: Eviction subtracts the old row before the new one is written, so
+        #      a write that raised halfway would leave the summaries permanently
+        #      off. Packing the ints into a scratch array surfaces int64 overflow
+        #      first; the column writes under the lock then cannot fail.
+        array("q", (prompt_tokens, completion_tokens, total))
 
         with self._lock:
-            self._records.append(record)
+            idx = next(self._head) & self._mask
+            # Evict the oldest row from the running summaries before overwriting it
+            if self._caller_codes[idx] != -1:
+                self._apply(idx, -1)
+                self._release(self._provider_codes[idx])
+                self._release(self._conversation_codes[idx])
+                self._release(self._caller_codes[idx])
+            self._prompt_tokens[idx] = prompt_tokens
+            self._completion_tokens[idx] = completion_tokens
+            self._total_tokens[idx] = total
+            self._cost_usd[idx] = cost
+            self._duration_ms[idx] = duration_ms
+            self._success[idx] = success
+            self._provider_codes[idx] = self._intern(provider)
+            self._conversation_codes[idx] = self._intern(conversation_id)
+            self._caller_codes[idx] = self._intern(caller)
+            self._apply(idx, 1)
 
         return record
 
+    def _apply(self, idx: int, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) row `idx` from the running summaries."""
+        success = self._success[idx]
+        prompt_tokens = self._prompt_tokens[idx]
+        completion_tokens = self._completion_tokens[idx]
+        total_tokens = self._total_tokens[idx]
+        cost_usd = self._cost_usd[idx]
+        duration_ms = self._duration_ms[idx]
+        _accumulate(self._session, sign, success, prompt_tokens, completion_tokens, total_tokens, cost_usd, duration_ms)
+        for table, codes in self._keyed_summaries:
+            key = self._names[codes[idx]]
+            summary = table.get(key)
+            if summary is None:
+                summary = table[key] = CostSummary()
+            _accumulate(summary, sign, success, prompt_tokens, completion_tokens, total_tokens, cost_usd, duration_ms)
+            if not summary.total_calls:
+                del table[key]
+
+        caller = self._names[self._caller_codes[idx]]
+        sketch = self._latency.get(caller)
+        if sketch is None:
+            sketch = self._latency[caller] = _LatencySketch()
+        sketch.add(duration_ms, sign)
+        if not sketch.count:
+            del self._latency[caller]
+
+    def _summary_copy(self, table: dict[str, CostSummary], key: str) -> CostSummary:
+        with self._lock:
+            summary = table.get(key)
+            return replace(summary) if summary is not None else CostSummary()
+
     def conversation_summary(self, conversation_id: str) -> CostSummary:
         """Aggregate costs for a specific conversation."""
-        with self._lock:
-            records = [r for r in self._records if r.conversation_id == conversation_id]
-        return self._aggregate(records)
+        return self._summary_copy(self._by_conversation, conversation_id)
 
     def session_summary(self) -> CostSummary:
-        """Aggregate all costs since tracker creation."""
+        """Aggregate all costs in the retained window."""
         with self._lock:
-            records = list(self._records)
-        return self._aggregate(records)
+            return replace(self._session)
 
     def provider_summary(self, provider: str) -> CostSummary:
         """Aggregate costs for a specific provider."""
-        with self._lock:
-            records = [r for r in self._records if r.provider == provider]
-        return self._aggregate(records)
+        return self._summary_copy(self._by_provider, provider)
 
     def caller_summary(self, caller: str) -> CostSummary:
         """Aggregate costs for a specific caller/agent."""
-        with self._lock:
-            records = [r for r in self._records if r.caller == caller]
-        return self._aggregate(records)
-
-    @staticmethod
-    def _aggregate(records: list[CallRecord]) -> CostSummary:
-        summary = CostSummary()
-        for r in records:
-            summary.total_calls += 1
-            if r.success:
-                summary.successful_calls += 1
-            else:
-                summary.failed_calls += 1
-            summary.total_prompt_tokens += r.prompt_tokens
-            summary.total_completion_tokens += r.completion_tokens
-            summary.total_tokens += r.total_tokens
-            summary.total_cost_usd += r.estimated_cost_usd
-            summary.total_duration_ms += r.duration_ms
-        return summary
+        return self._summary_copy(self._by_caller, caller)
 
     def agent_observability(self, agent_name: str) -> AgentObservability:
         """Per-agent observability metrics with percentile latencies.
@@ -205,47 +410,73 @@ class CostTracker:
         WHY: Identifies which agent is slow or error-prone. The p95 latency
              catches tail latencies that avg_latency hides.
         """
+        # WHY: Readers copy under the lock and compute outside it, so a long
+        #      report never holds up record(). A reader/writer lock would cost
+        #      more per record() than these copies save.
         with self._lock:
-            records = [r for r in self._records if r.caller == agent_name]
-
-        if not records:
-            return AgentObservability(agent_name=agent_name)
-
-        durations = sorted(r.duration_ms for r in records)
-        success_count = sum(1 for r in records if r.success)
-        error_count = len(records) - success_count
-
-        return AgentObservability(
-            agent_name=agent_name,
-            call_count=len(records),
-            error_count=error_count,
-            error_rate=error_count / len(records) if records else 0.0,
-            total_tokens=sum(r.total_tokens for r in records),
-            total_cost_usd=sum(r.estimated_cost_usd for r in records),
-            avg_latency_ms=sum(durations) / len(durations),
-            p50_latency_ms=_percentile(durations, 50),
-            p95_latency_ms=_percentile(durations, 95),
-            max_latency_ms=max(durations) if durations else 0.0,
-        )
+            summary = self._by_caller.get(agent_name)
+            if summary is None:
+                return AgentObservability(agent_name=agent_name)
+            summary = replace(summary)
+            sketch = self._latency[agent_name].copy()
+        return _build_observability(agent_name, summary, sketch)
 
     def observability_report(self) -> dict[str, AgentObservability]:
         """Full observability report keyed by agent name."""
+        # One lock acquisition snapshots every agent, rather than one per agent
         with self._lock:
-            agent_names = {r.caller for r in self._records}
-        return {name: self.agent_observability(name) for name in sorted(agent_names)}
+            snapshot = [
+                (name, replace(summary), self._latency[name].copy())
+                for name, summary in self._by_caller.items()
+            ]
+        snapshot.sort(key=lambda item: item[0])
+        return {name: _build_observability(name, summary, sketch) for name, summary, sketch in snapshot}
 
     def reset(self) -> None:
         """Clear all records. Useful for per-run tracking."""
         with self._lock:
-            self._records.clear()
-
-
-def _percentile(sorted_values: list[float], pct: int) -> float:
-    """Compute percentile from pre-sorted values (nearest-rank method)."""
-    if not sorted_values:
-        return 0.0
-    k = max(0, min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100)))
-    return sorted_values[k]
+            self._init_columns(self._mask + 1)
+
+
+def _build_observability(agent_name: str, summary: CostSummary, sketch: _LatencySketch) -> AgentObservability:
+    """Combine an agent's summary and latency sketch into observability metrics."""
+    p50, p95 = sketch.percentiles(50, 95)
+    return AgentObservability(
+        agent_name=agent_name,
+        call_count=summary.total_calls,
+        error_count=summary.failed_calls,
+        error_rate=summary.failed_calls / summary.total_calls,
+        total_tokens=summary.total_tokens,
+        total_cost_usd=summary.total_cost_usd,
+        avg_latency_ms=summary.total_duration_ms / summary.total_calls,
+        p50_latency_ms=p50,
+        p95_latency_ms=p95,
+        # Bucket upper edge rather than midpoint, so max >= true max >= avg
+        max_latency_ms=sketch.upper_bound(),
+    )
+
+
+def _accumulate(
+    summary: CostSummary,
+    sign: int,
+    success: int,
+    prompt_tokens: int,
+    completion_tokens: int,
+    total_tokens: int,
+    cost_usd: float,
+    duration_ms: float,
+) -> None:
+    """Add one call's figures to `summary`, scaled by sign (+1 add, -1 evict)."""
+    summary.total_calls += sign
+    if success:
+        summary.successful_calls += sign
+    else:
+        summary.failed_calls += sign
+    summary.total_prompt_tokens += sign * prompt_tokens
+    summary.total_completion_tokens += sign * completion_tokens
+    summary.total_tokens += sign * total_tokens
+    summary.total_cost_usd += sign * cost_usd
+    summary.total_duration_ms += sign * duration_ms
 
 
 # Global singleton
@@ -19,8 +19,11 @@ from __future__ import annotations
 
 import ast
 import json
+import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
@@ -30,9 +33,16 @@ ALLOWLIST_PATH = ROOT / "scripts" / "architecture_limits_allowlist.json"
 
 # Directories and suffixes to scan
 INCLUDE_DIRS = ("src", "backend", "frontend", "lib", "app", "packages")
-EXCLUDE_DIRS = ("node_modules", ".next", ".venv", "__pycache__", ".git", "dist", "build")
+EXCLUDE_DIRS = frozenset({"node_modules", ".next", ".venv", "__pycache__", ".git", "dist", "build"})
 PY_SUFFIXES = (".py",)
 TS_SUFFIXES = (".ts", ".tsx")
+SOURCE_SUFFIXES = PY_SUFFIXES + TS_SUFFIXES
+# Start of a TS function body: `function name(` or an arrow function block
+TS_FUNCTION_RE = re.compile(r"\bfunction\s+\w+\s*\(|=>\s*\{")
+# Statement-list fields of compound statements (ClassDef, If, For, While, With, Try)
+STATEMENT_BODY_FIELDS = ("body", "orelse", "finalbody")
+# Below this many files, process-pool startup costs more than parsing serially
+PARALLEL_MIN_FILES = 256
 
 
 def load_allowlist() -> set[str]:
@@ -50,13 +60,13 @@ def collect_files() -> list[Path]:
         base = ROOT / include
         if not base.is_dir():
             continue
-        for path in base.rglob("*"):
-            if not path.is_file():
-                continue
-            if any(ex in path.parts for ex in EXCLUDE_DIRS):
-                continue
-            if path.suffix in PY_SUFFIXES or path.suffix in TS_SUFFIXES:
-                out.append(path)
+        for dirpath, dirnames, filenames in os.walk(base):
+            # Prune in place so excluded trees (node_modules, .next) are never entered
+            dirnames[:] = [d for d in dirnames if d not in EXCLUDE_DIRS]
+            for name in filenames:
+                # isfile() follows symlinks: a dangling *.ts/*.py link is skipped, not read
+                if name.endswith(SOURCE_SUFFIXES) and os.path.isfile(os.path.join(dirpath, name)):
+                    out.append(Path(dirpath, name))
     return sorted(out)
 
 
@@ -64,41 +74,54 @@ def rel(path: Path) -> str:
     return str(path.relative_to(ROOT))
 
 
-def line_count(path: Path) -> int:
-    try:
-        return len(path.read_text().splitlines())
-    except Exception:
-        return 0
-
-
 def function_ranges_py(content: str) -> list[tuple[int, int]]:
-    """Return (start_line, end_line) for each top-level function."""
+    """Return (start_line, end_line) for each function not nested in another function.
+
+    Walks statement bodies only — module, classes and compound statements
+    (if/try/with/for/while/match), so a `def` under `if sys.version_info`
+    or `except ImportError` is still checked. Expressions and function
+    bodies are skipped: nested functions always lie inside an enclosing
+    function's range, so visiting them (as ast.walk does) finds no new breaches.
+    """
     try:
         tree = ast.parse(content)
-        ranges: list[tuple[int, int]] = []
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-                start = node.lineno
-                end = node.end_lineno if hasattr(node, "end_lineno") and node.end_lineno else start
-                ranges.append((start, end))
-        return ranges
     except SyntaxError:
         return []
+    ranges: list[tuple[int, int]] = []
+    bodies = [tree.body]
+    while bodies:
+        for node in bodies.pop():
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                ranges.append((node.lineno, node.end_lineno or node.lineno))
+                continue
+            for name in STATEMENT_BODY_FIELDS:
+                block = getattr(node, name, None)
+                if block:
+                    bodies.append(block)
+            # except clauses and match cases are wrappers around statement bodies
+            bodies.extend(child.body for child in getattr(node, "handlers", ()))
+            bodies.extend(child.body for child in getattr(node, "cases", ()))
+    ranges.sort()
+    return ranges
 
 
 def function_ranges_ts(content: str) -> list[tuple[int, int]]:
     """Approximate function ranges in TS/TSx: block after 'function' or '=>'."""
     ranges: list[tuple[int, int]] = []
     lines = content.splitlines()
+    n = len(lines)
     i = 0
-    while i < len(lines):
+    while i < n:
         line = lines[i]
-        if re.search(r"\bfunction\s+\w+\s*\(|=>\s*\{", line):
+        # Substring prefilter: both regex alternatives need one of these literals,
+        # so most lines outside function bodies skip the regex engine entirely.
+        if ("function" in line or "=>" in line) and TS_FUNCTION_RE.search(line):
             start = i + 1
             depth = line.count("{") - line.count("}")
             j = i + 1
-            while j < len(lines) and depth > 0:
-                depth += lines[j].count("{") - lines[j].count("}")
+            while j < n and depth > 0:
+                body_line = lines[j]
+                depth += body_line.count("{") - body_line.count("}")
                 j += 1
             end = j
             ranges.append((start, end))
@@ -108,11 +131,14 @@ def function_ranges_ts(content: str) -> list[tuple[int, int]]:
     return ranges
 
 
-def check_file(path: Path, allowlist: set[str], errors: list[str]) -> None:
+def check_file(path: Path, allowlist: set[str]) -> list[str]:
+    """Return limit breaches for one file. Top-level so it can run in a worker process."""
+    errors: list[str] = []
     rel_path = rel(path)
     allowed = rel_path in allowlist
     content = path.read_text()
-    file_lines = len(content.splitlines())
+    # Count newlines rather than splitlines(): no list of line strings allocated
+    file_lines = content.count("\n") + (not content.endswith("\n")) if content else 0
 
     if file_lines > FILE_LINE_LIMIT and not allowed:
         errors.append(f"{rel_path}: {file_lines} lines (limit {FILE_LINE_LIMIT})")
@@ -127,14 +153,22 @@ def check_file(path: Path, allowlist: set[str], errors: list[str]) -> None:
             span = end - start + 1
             if span > FUNCTION_LINE_LIMIT and not allowed:
                 errors.append(f"{rel_path}: function at line {start} has {span} lines (limit {FUNCTION_LINE_LIMIT})")
+    return errors
 
 
 def main() -> int:
     allowlist = load_allowlist()
     files = collect_files()
+    check = partial(check_file, allowlist=allowlist)
     errors: list[str] = []
-    for path in files:
-        check_file(path, allowlist, errors)
+    if len(files) < PARALLEL_MIN_FILES:
+        for file_errors in map(check, files):
+            errors.extend(file_errors)
+    else:
+        # ast.parse is CPU-bound and per-file independent — fan out across cores
+        with ProcessPoolExecutor() as pool:
+            for file_errors in pool.map(check, files, chunksize=32):
+                errors.extend(file_errors)
 
     if errors:
         for e in errors:
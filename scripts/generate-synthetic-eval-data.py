@@ -21,12 +21,14 @@ LAST UPDATED: 2026-02-28
 """
 
 import argparse
-import json
 import os
 import sys
 from datetime import datetime
+from itertools import compress
 
+import orjson
 import psycopg2
+import psycopg2.extras
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -45,8 +47,12 @@ def load_seed_data(conn, task_type: str, limit: int = 100) -> list[dict]:
     """
     Load high-quality seed examples from ai_generations.
     Filters by task_type and user_feedback = 'accepted'.
+
+    Uses a server-side (named) cursor so rows stream in batches, and
+    RealDictCursor so psycopg2 builds the row dicts itself.
     """
-    cursor = conn.cursor()
+    cursor = conn.cursor(name="seed_stream", cursor_factory=psycopg2.extras.RealDictCursor)
+    cursor.itersize = 1000
     cursor.execute(
         """
         SELECT
@@ -62,10 +68,9 @@ def load_seed_data(conn, task_type: str, limit: int = 100) -> list[dict]:
         """,
         (task_type, limit),
     )
-    columns = [desc[0] for desc in cursor.description]
-    rows = cursor.fetchall()
+    rows = list(cursor)
     cursor.close()
-    return [dict(zip(columns, row)) for row in rows]
+    return rows
 
 
 def generate_with_gretel(
@@ -124,29 +129,39 @@ def simple_augmentation(seed_data: list[dict], multiplier: int) -> list[dict]:
     Simple augmentation fallback when Gretel is unavailable.
     Creates variants by adding noise to numerical fields and
     generating permutations of categorical fields.
+
+    Noise is sampled once per column with NumPy rather than per row,
+    so large multipliers stay fast.
     """
-    import random
-
-    augmented = []
-    for _ in range(multiplier):
-        for seed in seed_data:
-            variant = dict(seed)
-            # Add noise to numerical fields
-            if "quality_score" in variant and variant["quality_score"] is not None:
-                noise = random.uniform(-0.1, 0.1)
-                score = float(variant["quality_score"]) + noise
-                variant["quality_score"] = max(0.0, min(1.0, round(score, 3)))
-            if "input_tokens" in variant and variant["input_tokens"] is not None:
-                variant["input_tokens"] = max(
-                    1, int(variant["input_tokens"]) + random.randint(-50, 50)
-                )
-            if "output_tokens" in variant and variant["output_tokens"] is not None:
-                variant["output_tokens"] = max(
-                    1, int(variant["output_tokens"]) + random.randint(-30, 30)
-                )
-            variant["_synthetic"] = True
-            variant["_source"] = "simple_augmentation"
-            augmented.append(variant)
+    import numpy as np
+
+    rng = np.random.default_rng()
+    augmented = [
+        {**seed, "_synthetic": True, "_source": "simple_augmentation"}
+        for _ in range(multiplier)
+        for seed in seed_data
+    ]
+    if not augmented:
+        return augmented
+
+    def add_noise(field: str, noise, low: float, high: float | None, cast, decimals: int | None = None) -> None:
+        # Fields absent or None on the seed are left untouched on every variant
+        present = [seed.get(field) is not None for seed in seed_data]
+        if not any(present):
+            return
+        base = np.array([cast(seed[field]) if ok else 0 for seed, ok in zip(seed_data, present, strict=True)])
+        values = np.tile(base, multiplier) + noise
+        if decimals is not None:
+            values = values.round(decimals)
+        values = np.clip(values, low, high)
+        for variant, value, ok in zip(augmented, values.tolist(), present * multiplier, strict=True):
+            if ok:
+                variant[field] = value
+
+    n = len(augmented)
+    add_noise("quality_score", rng.uniform(-0.1, 0.1, size=n), 0.0, 1.0, float, decimals=3)
+    add_noise("input_tokens", rng.integers(-50, 51, size=n), 1, None, int)
+    add_noise("output_tokens", rng.integers(-30, 31, size=n), 1, None, int)
     return augmented
 
 
@@ -154,20 +169,22 @@ def validate_synthetic_data(data: list[dict]) -> list[dict]:
     """
     Basic quality checks on synthetic data.
     Removes entries with obviously invalid values.
+
+    Checks run as column masks over a DataFrame view; entries themselves
+    are passed through unchanged (no NaN/float coercion from pandas).
     """
-    valid = []
-    for entry in data:
-        # Check required fields exist
-        if not entry.get("task_type"):
-            continue
-        # Check quality score range
-        qs = entry.get("quality_score")
-        if qs is not None and (float(qs) < 0 or float(qs) > 1):
-            continue
-        # Check token counts are positive
-        if entry.get("input_tokens") is not None and int(entry["input_tokens"]) <= 0:
-            continue
-        valid.append(entry)
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(data, columns=["task_type", "quality_score", "input_tokens"])
+    # Required fields exist (non-empty)
+    mask = df["task_type"].fillna("").astype(bool)
+    # Quality score in [0, 1] when present
+    qs = df["quality_score"].astype(float)
+    mask &= qs.isna() | qs.between(0, 1)
+    # Token counts positive when present (int(x) > 0 ⇔ x >= 1)
+    tokens = df["input_tokens"].astype(float)
+    mask &= tokens.isna() | (tokens >= 1)
+    valid = list(compress(data, mask.tolist()))
 
     removed = len(data) - len(valid)
     if removed > 0:
@@ -181,8 +198,10 @@ def export_promptfoo_jsonl(data: list[dict], output_path: str):
     Each line is a test case with vars and assert fields.
     """
     os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    generated_at = datetime.utcnow().isoformat()
 
-    with open(output_path, "w") as f:
+    # orjson encodes straight to UTF-8 bytes; a 1 MiB buffer batches the writes
+    with open(output_path, "wb", buffering=1 << 20) as f:
         for entry in data:
             promptfoo_entry = {
                 "vars": {
@@ -202,10 +221,10 @@ def export_promptfoo_jsonl(data: list[dict], output_path: str):
                     "quality_score": entry.get("quality_score"),
                     "synthetic": entry.get("_synthetic", False),
                     "source": entry.get("_source", "production"),
-                    "generated_at": datetime.utcnow().isoformat(),
+                    "generated_at": generated_at,
                 },
             }
-            f.write(json.dumps(promptfoo_entry) + "\n")
+            f.write(orjson.dumps(promptfoo_entry, option=orjson.OPT_APPEND_NEWLINE))
 
     print(f"Exported {len(data)} entries to {output_path}")
 
@@ -8,18 +8,43 @@ Run manually:  python scripts/sync_claude_nav.py
 Runs automatically via pre-commit hook.
 """
 
+import hashlib
+import io
 import json
+import os
 import re
 import subprocess
 import sys
+from dataclasses import dataclass, field
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
 CLAUDE_MD = ROOT / "CLAUDE.md"
 
+# Fingerprint of the generator's inputs from the last run (see input_fingerprint)
+STATE_PATH = ROOT / ".git" / "sync_claude_nav.state"
+# Per-app files whose presence or content feeds the generated section
+APP_INPUTS = ("package.json", "src", "src/app/layout.tsx", "drizzle.config.ts", "app.json")
+
 SECTION_START = "## Codebase Navigation Map"
 # Matches the next ## heading (end of our section)
 NEXT_SECTION_RE = re.compile(r"^## (?!Codebase Navigation Map)", re.MULTILINE)
+# Matches: { href: '/foo', label: 'Foo' } or { href: '/', label: 'Home', exact: true }
+NAV_ITEM_RE = re.compile(r"""\{\s*href:\s*['"]([^'"]+)['"]\s*,\s*label:\s*['"]([^'"]+)['"]""")
+
+
+def iter_subdirs(parent: Path) -> list[Path]:
+    """Sorted subdirectories of `parent` ([] if it doesn't exist).
+
+    os.scandir answers is_dir() from the dirent type, so no per-entry stat
+    (Path.iterdir + is_dir issues one per entry).
+    """
+    try:
+        with os.scandir(parent) as it:
+            names = sorted(entry.name for entry in it if entry.is_dir())
+    except OSError:
+        return []
+    return [parent / name for name in names]
 
 
 def is_stub(app_dir: Path) -> bool:
@@ -27,29 +52,39 @@ def is_stub(app_dir: Path) -> bool:
     return not (app_dir / "src").is_dir()
 
 
-def read_description(pkg_dir: Path) -> str:
-    """Read description from package.json, or return empty string."""
-    pj = pkg_dir / "package.json"
-    if not pj.exists():
+# Parsed package.json descriptions keyed by path — shared across apps/services/packages
+_DESC_CACHE: dict[str, str] = {}
+
+
+def read_layout(app_dir: Path) -> str:
+    """Read src/app/layout.tsx once per app, or return "" if it doesn't exist."""
+    try:
+        return (app_dir / "src" / "app" / "layout.tsx").read_text()
+    except OSError:
         return ""
+
+
+def read_description(pkg_dir: Path) -> str:
+    """Read description from package.json, or return empty string.
+
+    Memoized per path (misses included), so repeat lookups skip stat + parse.
+    """
+    pj = str(pkg_dir / "package.json")
+    cached = _DESC_CACHE.get(pj)
+    if cached is not None:
+        return cached
     try:
-        data = json.loads(pj.read_text())
-        return data.get("description", "")
+        data = json.loads(Path(pj).read_text())
+        desc = data.get("description", "")
     except (json.JSONDecodeError, OSError):
-        return ""
+        desc = ""
+    _DESC_CACHE[pj] = desc
+    return desc
 
 
-def extract_nav_items(layout_path: Path) -> list[dict[str, str]]:
-    """Extract NAV_ITEMS array from a layout.tsx file. Returns list of {href, label}."""
-    if not layout_path.exists():
-        return []
-    content = layout_path.read_text()
-    # Match: { href: '/foo', label: 'Foo' } or { href: '/', label: 'Home', exact: true }
-    pattern = re.compile(
-        r"""\{\s*href:\s*['"]([^'"]+)['"]\s*,\s*label:\s*['"]([^'"]+)['"]""",
-    )
-    matches = pattern.findall(content)
-    return [{"href": m[0], "label": m[1]} for m in matches]
+def extract_nav_items(content: str) -> list[dict[str, str]]:
+    """Extract NAV_ITEMS array from layout.tsx content. Returns list of {href, label}."""
+    return [{"href": href, "label": label} for href, label in NAV_ITEM_RE.findall(content)]
 
 
 def detect_app_type(app_dir: Path) -> str:
@@ -63,12 +98,8 @@ def detect_app_type(app_dir: Path) -> str:
     return "unknown"
 
 
-def detect_nav_pattern(app_dir: Path) -> str:
-    """Detect nav pattern from layout.tsx content."""
-    layout = app_dir / "src" / "app" / "layout.tsx"
-    if not layout.exists():
-        return "—"
-    content = layout.read_text()
+def detect_nav_pattern(content: str) -> str:
+    """Detect nav pattern from layout.tsx content ("" when there is no layout)."""
     if "AdminSidebar" in content or "sidebar" in content.lower():
         return "Fixed left sidebar (`NAV_ITEMS` in `layout.tsx`)"
     if "sticky top" in content or "AppShell" in content:
@@ -78,117 +109,97 @@ def detect_nav_pattern(app_dir: Path) -> str:
     return "—"
 
 
+@dataclass
+class AppInfo:
+    """Everything the nav map needs about one app, gathered in a single pass."""
+
+    name: str
+    desc: str
+    is_stub: bool
+    app_type: str = "unknown"
+    nav_pattern: str = "—"
+    nav_items: list[dict[str, str]] = field(default_factory=list)
+
+
+def collect_apps(apps_dir: Path) -> list[AppInfo]:
+    """Walk apps/ once; both the Apps and Routes tables are built from the result."""
+    apps: list[AppInfo] = []
+    for app in iter_subdirs(apps_dir):
+        info = AppInfo(name=app.name, desc=read_description(app) or app.name, is_stub=is_stub(app))
+        if not info.is_stub:
+            layout = read_layout(app)
+            info.app_type = detect_app_type(app)
+            info.nav_pattern = detect_nav_pattern(layout)
+            if info.app_type == "next":
+                info.nav_items = extract_nav_items(layout)
+        apps.append(info)
+    return apps
+
+
 def generate_section() -> str:
     """Generate the full Codebase Navigation Map markdown section."""
-    lines: list[str] = []
-    lines.append(SECTION_START)
-    lines.append("")
-    lines.append(
-        "Turborepo monorepo. All apps share `@playbook/shared-types` and `@playbook/shared-ui`."
-    )
-    lines.append("")
+    buf = io.StringIO()
+    w = buf.write
+    w(f"{SECTION_START}\n\n")
+    w("Turborepo monorepo. All apps share `@playbook/shared-types` and `@playbook/shared-ui`.\n\n")
 
     # --- Apps table ---
-    lines.append("### Apps")
-    lines.append("")
-    lines.append("| App | Path | Purpose | Nav pattern |")
-    lines.append("|-----|------|---------|-------------|")
-
-    apps_dir = ROOT / "apps"
-    if apps_dir.is_dir():
-        for app in sorted(apps_dir.iterdir()):
-            if not app.is_dir():
-                continue
-            name = app.name
-            desc = read_description(app) or name
-            stub = is_stub(app)
-
-            if stub:
-                lines.append(
-                    f"| **{name}** | `apps/{name}/` | {desc} | **Stub — not yet implemented** |"
-                )
-            else:
-                nav = detect_nav_pattern(app)
-                lines.append(f"| **{name}** | `apps/{name}/` | {desc} | {nav} |")
-
-    lines.append("")
+    w("### Apps\n\n")
+    w("| App | Path | Purpose | Nav pattern |\n")
+    w("|-----|------|---------|-------------|\n")
+
+    apps = collect_apps(ROOT / "apps")
+    for app in apps:
+        nav = "**Stub — not yet implemented**" if app.is_stub else app.nav_pattern
+        w(f"| **{app.name}** | `apps/{app.name}/` | {app.desc} | {nav} |\n")
+    w("\n")
 
     # --- Routes per non-stub Next.js app ---
-    lines.append("### Routes")
-    lines.append("")
-
-    if apps_dir.is_dir():
-        for app in sorted(apps_dir.iterdir()):
-            if not app.is_dir() or is_stub(app):
-                continue
-            app_type = detect_app_type(app)
-            if app_type != "next":
-                continue
-            nav_items = extract_nav_items(app / "src" / "app" / "layout.tsx")
-            if not nav_items:
-                continue
-            lines.append(f"**{app.name}**: ", )
-            routes_str = " | ".join(
-                f"`{item['href']}` ({item['label']})" for item in nav_items
-            )
-            # Overwrite last line to include routes inline
-            lines[-1] = f"**{app.name}**: {routes_str}"
-            lines.append("")
+    w("### Routes\n\n")
+    for app in apps:
+        if not app.nav_items:
+            continue
+        routes_str = " | ".join(f"`{item['href']}` ({item['label']})" for item in app.nav_items)
+        w(f"**{app.name}**: {routes_str}\n\n")
 
     # --- Key file locations ---
-    lines.append("### Key file locations per app")
-    lines.append("")
-    lines.append("```")
-    lines.append("apps/{web,admin}/")
-    lines.append("├── src/app/layout.tsx      ← Root layout, nav config (NAV_ITEMS array), auth gating")
-    lines.append("├── src/app/page.tsx        ← Home route")
-    lines.append("├── src/app/*/page.tsx      ← Feature routes (prompts, costs, memory)")
-    lines.append("├── src/components/         ← Shared UI (NavLink for active-state highlighting)")
-    lines.append("├── src/providers/          ← Context providers (PostHog, Clerk)")
-    lines.append("├── src/hooks/              ← Custom hooks")
-    lines.append("└── src/middleware.ts       ← Clerk route middleware")
-    lines.append("")
-    lines.append("apps/api/")
-    lines.append("├── src/                    ← API server source")
-    lines.append("├── drizzle/               ← Database migrations")
-    lines.append("└── tests/                 ← API tests")
-    lines.append("```")
-    lines.append("")
+    w("### Key file locations per app\n\n")
+    w(
+        "```\n"
+        "apps/{web,admin}/\n"
+        "├── src/app/layout.tsx      ← Root layout, nav config (NAV_ITEMS array), auth gating\n"
+        "├── src/app/page.tsx        ← Home route\n"
+        "├── src/app/*/page.tsx      ← Feature routes (prompts, costs, memory)\n"
+        "├── src/components/         ← Shared UI (NavLink for active-state highlighting)\n"
+        "├── src/providers/          ← Context providers (PostHog, Clerk)\n"
+        "├── src/hooks/              ← Custom hooks\n"
+        "└── src/middleware.ts       ← Clerk route middleware\n"
+        "\n"
+        "apps/api/\n"
+        "├── src/                    ← API server source\n"
+        "├── drizzle/               ← Database migrations\n"
+        "└── tests/                 ← API tests\n"
+        "```\n\n"
+    )
 
     # --- Services table ---
-    lines.append("### Services & packages")
-    lines.append("")
-    lines.append("| Path | What |")
-    lines.append("|------|------|")
-
-    services_dir = ROOT / "services"
-    if services_dir.is_dir():
-        for svc in sorted(services_dir.iterdir()):
-            if not svc.is_dir():
-                continue
-            desc = read_description(svc) or svc.name
-            lines.append(f"| `services/{svc.name}/` | {desc} |")
-
-    packages_dir = ROOT / "packages"
-    if packages_dir.is_dir():
-        for pkg in sorted(packages_dir.iterdir()):
-            if not pkg.is_dir():
-                continue
-            desc = read_description(pkg) or pkg.name
-            lines.append(f"| `packages/{pkg.name}/` | {desc} |")
-
-    lines.append("")
+    w("### Services & packages\n\n")
+    w("| Path | What |\n")
+    w("|------|------|\n")
+    for svc in iter_subdirs(ROOT / "services"):
+        w(f"| `services/{svc.name}/` | {read_description(svc) or svc.name} |\n")
+    for pkg in iter_subdirs(ROOT / "packages"):
+        w(f"| `packages/{pkg.name}/` | {read_description(pkg) or pkg.name} |\n")
+    w("\n")
 
     # --- Navigation conventions ---
-    lines.append("### Navigation conventions")
-    lines.append("")
-    lines.append("- Both web and admin apps use a `NAV_ITEMS` config array in `layout.tsx` — add new routes there")
-    lines.append("- Active link highlighting via `NavLink` client component (`src/components/nav-link.tsx`)")
-    lines.append("- All routing is Next.js App Router file-system based — no external router library")
-    lines.append("- To add a new page: create `src/app/{route}/page.tsx` + add entry to `NAV_ITEMS`")
-    lines.append("")
+    w("### Navigation conventions\n\n")
+    w("- Both web and admin apps use a `NAV_ITEMS` config array in `layout.tsx` — add new routes there\n")
+    w("- Active link highlighting via `NavLink` client component (`src/components/nav-link.tsx`)\n")
+    w("- All routing is Next.js App Router file-system based — no external router library\n")
+    w("- To add a new page: create `src/app/{route}/page.tsx` + add entry to `NAV_ITEMS`\n")
 
-    return "\n".join(lines)
+    return buf.getvalue()
 
 
 def update_claude_md() -> bool:
@@ -229,8 +240,41 @@ def update_claude_md() -> bool:
     return True
 
 
+def input_fingerprint() -> str:
+    """Hash (path, mtime_ns, size) of every file the generated section depends on.
+
+    Covers the subdirectory listing of apps/, services/, packages/, the
+    per-app inputs, CLAUDE.md and this script — a handful of stat calls,
+    no file reads.
+    """
+    paths = [CLAUDE_MD, Path(__file__).resolve()]
+    for top, inputs in (("apps", APP_INPUTS), ("services", ("package.json",)), ("packages", ("package.json",))):
+        for sub in iter_subdirs(ROOT / top):
+            paths.extend(sub / name for name in inputs)
+    entries = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            entries.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            entries.append(f"{path}:missing")
+    return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+
 def main() -> int:
+    # Fast path: nothing the section depends on changed since the last run
+    # (no .git dir, e.g. a worktree or tarball, just means no fast path)
+    use_state = STATE_PATH.parent.is_dir()
+    fingerprint = input_fingerprint() if use_state else ""
+    if use_state and STATE_PATH.is_file() and STATE_PATH.read_text().strip() == fingerprint:
+        return 0
+
+    # A full regeneration reads only a few dozen small files, so changed inputs
+    # rebuild the whole section rather than diffing against the previous one.
     changed = update_claude_md()
+    if use_state:
+        # CLAUDE.md is itself an input — re-stat only if we just rewrote it
+        STATE_PATH.write_text((input_fingerprint() if changed else fingerprint) + "\n")
     if changed:
         # Stage the updated CLAUDE.md so it's included in the commit
         subprocess.run(["git", "add", str(CLAUDE_MD)], cwd=ROOT, check=True)
@@ -2,23 +2,105 @@
 FILE PURPOSE: Crawl4AI web scraping microservice
 WHY: Replaces Firecrawl ($16/mo) with open-source Crawl4AI for URL-to-markdown conversion.
      Called by the Node.js WebIngester adapter via REST.
-HOW: FastAPI app with POST /scrape and GET /health endpoints.
-     Uses AsyncWebCrawler with headless Chromium for JS-rendered pages.
+HOW: FastAPI app with POST /scrape, POST /scrape_batch and GET /health endpoints.
+     One AsyncWebCrawler (headless Chromium for JS-rendered pages) is started
+     with the app and shared by all requests — browser launch costs far more
+     than a typical page crawl. If Chromium dies, the next scrape relaunches
+     it and /health reports 503 until then.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 from typing import Any
 
-from fastapi import FastAPI
-from pydantic import BaseModel, HttpUrl
+from fastapi import FastAPI, Request, Response
+from pydantic import BaseModel, Field, HttpUrl
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Crawl4AI Scraper", version="1.0.0")
+# Pages crawled at once across all requests — each is a browser tab on the shared crawler
+MAX_CONCURRENCY = int(os.environ.get("SCRAPE_MAX_CONCURRENCY", "20"))
+MAX_BATCH_URLS = 100
+
+
+class RawMarkdownGenerator(DefaultMarkdownGenerator):
+    """DefaultMarkdownGenerator that skips the link-to-citation pass.
+
+    WHY: Callers only read raw_markdown, but crawl4ai always rewrites every
+         link into numbered citations plus a references block (the crawler
+         never passes citations=False). That second pass over the markdown
+         is pure waste here.
+    """
+
+    def generate_markdown(self, *args: Any, **kwargs: Any) -> Any:
+        kwargs["citations"] = False
+        return super().generate_markdown(*args, **kwargs)
+
+
+# Built once and shared — the run config is identical for every request.
+# nav/footer are dropped because they repeat the site's menus and link farms
+# on every page, which the ingester would otherwise chunk and embed as if it
+# were page content. (script/style are already stripped by the scraper.)
+CRAWLER_RUN_CONFIG = CrawlerRunConfig(
+    markdown_generator=RawMarkdownGenerator(),
+    excluded_tags=["nav", "footer"],
+)
+
+BROWSER_CONFIG = BrowserConfig(headless=True)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Launch the shared browser on startup and close it on shutdown."""
+    app.state.crawler = await AsyncWebCrawler(config=BROWSER_CONFIG).start()
+    app.state.crawler_lock = asyncio.Lock()
+    # One limit for /scrape and /scrape_batch together, so concurrent batches
+    # can't multiply the number of open tabs
+    app.state.scrape_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+    try:
+        yield
+    finally:
+        await app.state.crawler.close()
+
+
+def _browser_connected(crawler: AsyncWebCrawler) -> bool:
+    """True while the crawler's Chromium process is up (Playwright Browser.is_connected)."""
+    browser_manager = getattr(crawler.crawler_strategy, "browser_manager", None)
+    browser = getattr(browser_manager, "browser", None)
+    return browser is not None and browser.is_connected()
+
+
+async def _live_crawler(app: FastAPI) -> AsyncWebCrawler:
+    """Return the shared crawler, relaunching it first if its browser has died.
+
+    WHY: A crashed Chromium doesn't exit the process, so the platform's
+         restart-on-failure never fires; without this every later request
+         would fail until a manual restart.
+    """
+    crawler: AsyncWebCrawler = app.state.crawler
+    if _browser_connected(crawler):
+        return crawler
+    async with app.state.crawler_lock:
+        # Concurrent requests all see the dead browser — only the first relaunches
+        if app.state.crawler is crawler:
+            logger.error("Browser disconnected — relaunching crawler")
+            try:
+                await crawler.close()
+            except Exception:
+                logger.exception("Error closing dead crawler")
+            app.state.crawler = await AsyncWebCrawler(config=BROWSER_CONFIG).start()
+        return app.state.crawler
+
+
+app = FastAPI(title="Crawl4AI Scraper", version="1.0.0", lifespan=lifespan)
 
 
 class ScrapeRequest(BaseModel):
@@ -31,22 +113,29 @@ class ScrapeResponse(BaseModel):
     metadata: dict[str, Any]
 
 
+class ScrapeBatchRequest(BaseModel):
+    urls: list[HttpUrl] = Field(min_length=1, max_length=MAX_BATCH_URLS)
+
+
+class ScrapeBatchResponse(BaseModel):
+    results: list[ScrapeResponse]  # same order as the request's urls
+
+
 @app.get("/health")
-async def health() -> dict[str, str]:
+async def health(request: Request, response: Response) -> dict[str, str]:
+    if not _browser_connected(request.app.state.crawler):
+        response.status_code = 503
+        return {"status": "browser_down"}
     return {"status": "ok"}
 
 
-@app.post("/scrape", response_model=ScrapeResponse)
-async def scrape(req: ScrapeRequest) -> ScrapeResponse:
-    url = str(req.url)
+async def _scrape_one(app: FastAPI, url: str) -> ScrapeResponse:
+    """Crawl one URL on the shared crawler. Never raises — failures are reported in the response."""
     logger.info("Scraping %s", url)
-
-    browser_config = BrowserConfig(headless=True)
-    crawler_config = CrawlerRunConfig()
-
     try:
-        async with AsyncWebCrawler(config=browser_config) as crawler:
-            result = await crawler.arun(url=url, config=crawler_config)
+        async with app.state.scrape_slots:
+            crawler = await _live_crawler(app)
+            result = await crawler.arun(url=url, config=CRAWLER_RUN_CONFIG)
 
         if not result.success:
             logger.warning("Crawl4AI failed for %s: %s", url, result.error_message)
@@ -72,3 +161,15 @@ async def scrape(req: ScrapeRequest) -> ScrapeResponse:
             markdown="",
             metadata={"url": url, "error": str(exc)},
         )
+
+
+@app.post("/scrape", response_model=ScrapeResponse)
+async def scrape(req: ScrapeRequest, request: Request) -> ScrapeResponse:
+    return await _scrape_one(request.app, str(req.url))
+
+
+@app.post("/scrape_batch", response_model=ScrapeBatchResponse)
+async def scrape_batch(req: ScrapeBatchRequest, request: Request) -> ScrapeBatchResponse:
+    """Scrape many URLs in one round-trip; wall time tracks the slowest page, not the sum."""
+    results = await asyncio.gather(*(_scrape_one(request.app, str(u)) for u in req.urls))
+    return ScrapeBatchResponse(results=list(results))
@@ -20,17 +20,18 @@ LAST UPDATED: 2026-02-28
 """
 
 import argparse
+import copy
 import json
 import os
 import sys
+import threading
+from concurrent.futures import Future
 from datetime import datetime
+from functools import lru_cache
 
-import dspy
-import litellm
-import psycopg2
-from dotenv import load_dotenv
-
-load_dotenv()
+# dspy, psycopg, yaml and httpx are imported inside the functions that use
+# them: dspy alone pulls in pydantic + openai + litellm (~1s), which --help
+# and the early-exit paths (no DATABASE_URL, too few examples) never need.
 
 
 def get_db_connection():
@@ -39,57 +40,100 @@ def get_db_connection():
     if not database_url:
         print("ERROR: DATABASE_URL not set", file=sys.stderr)
         sys.exit(1)
-    return psycopg2.connect(database_url)
+
+    import psycopg
+
+    return psycopg.connect(database_url)
 
 
 def load_training_examples(
     conn, prompt_name: str, min_quality: float = 0.7, limit: int = 500
-) -> list[dict]:
+) -> tuple[list[tuple], list[tuple]]:
     """
     Load high-quality examples from ai_generations table.
     Filters by prompt_version matching the prompt_name prefix and quality_score.
+    Rows are namedtuples (attribute access, e.g. ex.task_type) — no per-row dict —
+    streamed from a server-side (named) cursor in batches of 100, so the full
+    result set is never buffered client-side before being split. Results use
+    psycopg's binary format, so floats/ints decode without a text round trip.
+
+    Returns (train, holdout): the database labels the top 4/5 by quality_score
+    as train and the bottom 1/5 as holdout (ntile over the limited result).
     """
-    cursor = conn.cursor()
+    from psycopg.rows import namedtuple_row
+
+    cursor = conn.cursor(name="gen_stream", row_factory=namedtuple_row)
+    cursor.itersize = 100
     cursor.execute(
         """
-        SELECT
-            prompt_hash, prompt_version, task_type,
-            response_hash, quality_score, user_feedback,
-            input_tokens, output_tokens
-        FROM ai_generations
-        WHERE prompt_version LIKE %s
-          AND quality_score >= %s
-          AND user_feedback IN ('accepted', 'edited')
+        SELECT *, ntile(5) OVER (ORDER BY quality_score DESC) AS split_bucket
+        FROM (
+            SELECT
+                prompt_hash, prompt_version, task_type,
+                response_hash, quality_score, user_feedback,
+                input_tokens, output_tokens
+            FROM ai_generations
+            WHERE prompt_version LIKE %s
+              AND quality_score >= %s
+              AND user_feedback IN ('accepted', 'edited')
+            ORDER BY quality_score DESC
+            LIMIT %s
+        ) AS top_examples
         ORDER BY quality_score DESC
-        LIMIT %s
         """,
         (f"{prompt_name}%", min_quality, limit),
+        binary=True,
     )
-    columns = [desc[0] for desc in cursor.description]
-    rows = cursor.fetchall()
+    train: list[tuple] = []
+    holdout: list[tuple] = []
+    for row in cursor:
+        (train if row.split_bucket <= 4 else holdout).append(row)
     cursor.close()
-    return [dict(zip(columns, row)) for row in rows]
+    return train, holdout
+
+
+# Used when config.yaml is missing or PyYAML isn't installed
+_DEFAULT_CONFIG = {
+    "teacher_model": "claude-sonnet",
+    "student_model": "claude-haiku",
+    "num_trials": 10,
+    "metric_threshold": 0.8,
+}
+
+
+@lru_cache(maxsize=4)
+def _parse_config(config_path: str, mtime_ns: int, size: int) -> dict:
+    """Parse config.yaml once per (mtime_ns, size) — an edited file is re-read."""
+    import yaml
+
+    # libyaml's C loader when PyYAML was built with it; same safe semantics
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(config_path) as f:
+        return yaml.load(f, Loader=loader) or {}
 
 
 def load_config() -> dict:
-    """Load optimizer configuration from config.yaml."""
+    """Load optimizer configuration from config.yaml (memoized per file version).
+
+    Returns a deep copy, so a caller mutating its config can't alter the cache.
+    """
     config_path = os.path.join(os.path.dirname(__file__), "config.yaml")
     try:
-        import yaml
-
-        with open(config_path) as f:
-            return yaml.safe_load(f) or {}
+        st = os.stat(config_path)
+        return copy.deepcopy(_parse_config(config_path, st.st_mtime_ns, st.st_size))
     except (ImportError, FileNotFoundError):
-        return {
-            "teacher_model": "claude-sonnet",
-            "student_model": "claude-haiku",
-            "num_trials": 10,
-            "metric_threshold": 0.8,
-        }
+        return dict(_DEFAULT_CONFIG)
+
+
+def build_lms(config: dict):
+    """Build the teacher/student DSPy LMs backed by the LiteLLM proxy.
 
+    Safe to run off the main thread (main() overlaps it with the DB query);
+    dspy.configure itself must stay on the main thread, since DSPy only lets
+    the thread that first configured it reconfigure.
+    """
+    import dspy
 
-def configure_dspy(config: dict):
-    """Configure DSPy with LiteLLM proxy as the LM backend."""
     proxy_url = os.environ.get("LITELLM_PROXY_URL", "http://localhost:4000/v1")
     api_key = os.environ.get("LITELLM_API_KEY", "")
 
@@ -107,17 +151,29 @@ def configure_dspy(config: dict):
         api_base=proxy_url,
         api_key=api_key,
     )
-
-    dspy.configure(lm=teacher)
     return teacher, student
 
 
-class PromptOptimizationSignature(dspy.Signature):
-    """Optimize a prompt for a specific task type using labeled examples."""
+@lru_cache(maxsize=1)
+def prompt_optimization_signature():
+    """Build the PromptOptimizationSignature class (deferred so dspy loads lazily)."""
+    import dspy
+
+    class PromptOptimizationSignature(dspy.Signature):
+        """Optimize a prompt for a specific task type using labeled examples."""
+
+        task_description: str = dspy.InputField(desc="Description of what the prompt should do")
+        input_example: str = dspy.InputField(desc="Representative input for the task")
+        output: str = dspy.OutputField(desc="Optimized response")
+
+    return PromptOptimizationSignature
+
+
+# Below this many examples there is nothing meaningful to bootstrap from
+MIN_OPTIMIZATION_EXAMPLES = 5
 
-    task_description: str = dspy.InputField(desc="Description of what the prompt should do")
-    input_example: str = dspy.InputField(desc="Representative input for the task")
-    output: str = dspy.OutputField(desc="Optimized response")
+# Structured output signals (JSON, markdown, lists) checked by quality_metric
+_MARKERS = ("{", "##", "- ", "1.")
 
 
 def quality_metric(example, prediction, trace=None) -> float:
@@ -125,79 +181,86 @@ def quality_metric(example, prediction, trace=None) -> float:
     Evaluate prediction quality.
     Returns 0-1 score based on output presence and basic quality signals.
     """
-    if not prediction.output or len(prediction.output.strip()) == 0:
+    output = prediction.output
+    stripped = output.strip() if output else ""
+    if not stripped:
         return 0.0
 
     score = 0.5  # Base score for non-empty output
 
-    # Length reasonableness (not too short, not too long)
-    word_count = len(prediction.output.split())
+    # Length reasonableness (not too short, not too long).
+    # maxsplit=500 keeps the count exact for the 10..500 check (501 parts
+    # means "more than 500") without splitting the rest of a long output.
+    word_count = len(output.split(None, 500))
     if 10 <= word_count <= 500:
         score += 0.2
 
     # Structured output signals (JSON, markdown, etc.)
-    if any(marker in prediction.output for marker in ["{", "##", "- ", "1."]):
-        score += 0.15
+    for marker in _MARKERS:
+        if marker in output:
+            score += 0.15
+            break
 
     # Completeness (ends with proper punctuation or closing bracket)
-    stripped = prediction.output.strip()
-    if stripped and stripped[-1] in ".!?}]":
+    if stripped[-1] in ".!?}]":
         score += 0.15
 
     return min(1.0, score)
 
 
 def run_optimization(
-    examples: list[dict], config: dict, prompt_name: str
+    train_rows: list[tuple], holdout_rows: list[tuple], teacher, config: dict, prompt_name: str
 ) -> dict | None:
     """
-    Run DSPy optimizer on training examples.
+    Run DSPy optimizer on training examples, scoring on the holdout rows.
     Returns the optimized prompt config or None if optimization fails.
     """
-    if len(examples) < 5:
-        print(f"WARN: Only {len(examples)} examples — need at least 5 for optimization", file=sys.stderr)
+    num_examples = len(train_rows) + len(holdout_rows)
+    if num_examples < MIN_OPTIMIZATION_EXAMPLES:
+        print(
+            f"WARN: Only {num_examples} examples — need at least {MIN_OPTIMIZATION_EXAMPLES} for optimization",
+            file=sys.stderr,
+        )
         return None
 
-    teacher, student = configure_dspy(config)
+    import dspy
+
+    dspy.configure(lm=teacher)
     num_trials = config.get("num_trials", 10)
     threshold = config.get("metric_threshold", 0.8)
 
     # Convert examples to DSPy format
-    trainset = []
-    for ex in examples:
-        trainset.append(
-            dspy.Example(
-                task_description=f"Task: {ex.get('task_type', 'general')} for prompt {prompt_name}",
-                input_example=ex.get("prompt_hash", ""),
-            ).with_inputs("task_description", "input_example")
-        )
+    def to_example(ex) -> dspy.Example:
+        return dspy.Example(
+            task_description=f"Task: {ex.task_type} for prompt {prompt_name}",
+            input_example=ex.prompt_hash,
+        ).with_inputs("task_description", "input_example")
 
-    # Split into train/eval
-    split_idx = max(1, int(len(trainset) * 0.8))
-    train_examples = trainset[:split_idx]
-    eval_examples = trainset[split_idx:]
+    train_examples = [to_example(ex) for ex in train_rows]
+    eval_examples = [to_example(ex) for ex in holdout_rows]
 
     # Run optimizer
-    program = dspy.ChainOfThought(PromptOptimizationSignature)
+    program = dspy.ChainOfThought(prompt_optimization_signature())
 
     try:
         optimizer = dspy.BootstrapFewShot(
             metric=quality_metric,
             max_bootstrapped_demos=4,
             max_labeled_demos=8,
-            num_threads=1,
         )
         optimized = optimizer.compile(program, trainset=train_examples)
     except Exception as e:
         print(f"ERROR: Optimization failed: {e}", file=sys.stderr)
         return None
 
-    # Evaluate on holdout set
+    # Evaluate on holdout set — LM calls are network-bound, so score the
+    # holdout examples concurrently (all threads share the configured LM)
     if eval_examples:
+        num_threads = config.get("num_threads") or min(8, len(eval_examples))
         evaluator = dspy.Evaluate(
             devset=eval_examples,
             metric=quality_metric,
-            num_threads=1,
+            num_threads=num_threads,
         )
         score = evaluator(optimized)
         print(f"Optimization score on holdout: {score:.3f} (threshold: {threshold})")
@@ -216,39 +279,65 @@ def run_optimization(
             "num_demos": len(train_examples),
             "eval_score": round(score, 3),
             "optimized_at": datetime.utcnow().isoformat(),
-        }),
+        }, separators=(",", ":")),
         "author": "dspy-optimizer",
         "eval_score": round(score, 3),
     }
 
 
+@lru_cache(maxsize=1)
+def _http_client():
+    """Pooled HTTP client shared by every post_prompt call (one handshake per host)."""
+    import httpx
+
+    return httpx.Client(timeout=30.0)
+
+
 def post_prompt(prompt_data: dict):
     """POST optimized prompt to the API's /api/prompts endpoint."""
     api_url = os.environ.get("API_URL", "http://localhost:3002")
     api_key = os.environ.get("API_KEY", "")
 
-    import urllib.request
-
-    req = urllib.request.Request(
-        f"{api_url}/api/prompts",
-        data=json.dumps(prompt_data).encode("utf-8"),
-        headers={
-            "Content-Type": "application/json",
-            "x-api-key": api_key,
-        },
-        method="POST",
-    )
+    # Compact UTF-8 body, encoded once and sent with a Content-Length (the
+    # payload is well under 1 KB — streaming would only force chunked encoding)
+    body = json.dumps(prompt_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
     try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            result = json.loads(resp.read().decode())
-            print(f"Prompt created: {result.get('id', 'unknown')} version {result.get('version', 'unknown')}")
-            return result
+        resp = _http_client().post(
+            f"{api_url}/api/prompts",
+            content=body,
+            headers={"Content-Type": "application/json", "x-api-key": api_key},
+        )
+        resp.raise_for_status()
+        result = resp.json()
+        print(f"Prompt created: {result.get('id', 'unknown')} version {result.get('version', 'unknown')}")
+        return result
     except Exception as e:
         print(f"ERROR: Failed to POST prompt: {e}", file=sys.stderr)
         return None
 
 
+def run_in_background(fn, *args) -> Future:
+    """Run fn(*args) on a daemon thread; the returned Future holds its result or exception.
+
+    WHY: ThreadPoolExecutor workers are joined at interpreter exit, so an
+         early exit (too few examples) would still sit out the ~1s dspy
+         import. A daemon thread is abandoned at exit instead.
+    """
+    future: Future = Future()
+
+    def target() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=target, name=f"bg-{fn.__name__}", daemon=True).start()
+    return future
+
+
 def main():
     parser = argparse.ArgumentParser(description="DSPy prompt optimization pipeline")
     parser.add_argument("--prompt-name", required=True, help="Prompt name to optimize")
@@ -261,31 +350,43 @@ def main():
     print(f"Config: teacher={config.get('teacher_model')}, student={config.get('student_model')}")
 
     conn = get_db_connection()
+    # Importing dspy and building the LMs overlaps with the DB query
+    lms_future = run_in_background(build_lms, config)
     try:
-        examples = load_training_examples(
+        train_rows, holdout_rows = load_training_examples(
             conn, args.prompt_name, min_quality=args.min_quality
         )
-        print(f"Loaded {len(examples)} training examples for '{args.prompt_name}'")
-
-        if len(examples) < args.min_examples:
-            print(
-                f"WARN: Need {args.min_examples} examples, got {len(examples)} — skipping optimization",
-                file=sys.stderr,
-            )
-            sys.exit(0)
-
-        result = run_optimization(examples, config, args.prompt_name)
-        if result is None:
-            print("Optimization did not produce a winning prompt")
-            sys.exit(0)
-
-        if args.dry_run:
-            print(f"DRY RUN — would POST: {json.dumps(result, indent=2)}")
-        else:
-            post_prompt(result)
     finally:
+        # The query is the only DB work — don't hold the connection
+        # through the (minutes-long) optimization run
         conn.close()
+    num_examples = len(train_rows) + len(holdout_rows)
+    print(f"Loaded {num_examples} training examples for '{args.prompt_name}'")
+
+    # Reject insufficient data before waiting on the DSPy setup — the
+    # daemon thread is abandoned, so this exit doesn't pay for the import
+    required = max(args.min_examples, MIN_OPTIMIZATION_EXAMPLES)
+    if num_examples < required:
+        print(
+            f"WARN: Need {required} examples, got {num_examples} — skipping optimization",
+            file=sys.stderr,
+        )
+        sys.exit(0)
+
+    teacher, _student = lms_future.result()
+    result = run_optimization(train_rows, holdout_rows, teacher, config, args.prompt_name)
+    if result is None:
+        print("Optimization did not produce a winning prompt")
+        sys.exit(0)
+
+    if args.dry_run:
+        print(f"DRY RUN — would POST: {json.dumps(result, indent=2)}")
+    else:
+        post_prompt(result)
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv()
     main()
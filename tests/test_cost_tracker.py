@@ -0,0 +1,107 @@
+"""
+FILE PURPOSE: Tests for the ring-buffer cost tracker in packages/shared-llm.
+
+WHY: The running summaries are maintained incrementally (add on record,
+     subtract on eviction); any drift between them and the retained window
+     is silent and permanent, so eviction and bad-input paths are pinned here.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+_MODULE_PATH = Path(__file__).resolve().parent.parent / "packages" / "shared-llm" / "src" / "cost-tracker.py"
+
+
+def _load_cost_tracker():
+    # Hyphenated filename — not importable by name, so load it from its path
+    spec = importlib.util.spec_from_file_location("cost_tracker", _MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # dataclasses resolves annotations via sys.modules
+    spec.loader.exec_module(module)
+    return module
+
+
+cost_tracker_module = _load_cost_tracker()
+
+
+def _record(tracker, **overrides):
+    kwargs = {
+        "provider": "together",
+        "model": "claude-haiku",
+        "caller": "jd_agent",
+        "conversation_id": "conv-1",
+        "prompt_tokens": 100,
+        "completion_tokens": 50,
+        "duration_ms": 10.0,
+        "success": True,
+    }
+    kwargs.update(overrides)
+    return tracker.record(**kwargs)
+
+
+def test_eviction_keeps_summaries_in_sync_with_window():
+    tracker = cost_tracker_module.CostTracker(capacity=2)
+    _record(tracker, conversation_id="a", prompt_tokens=1, completion_tokens=0)
+    _record(tracker, conversation_id="b", prompt_tokens=2, completion_tokens=0)
+    _record(tracker, conversation_id="c", prompt_tokens=4, completion_tokens=0)
+
+    session = tracker.session_summary()
+    assert session.total_calls == 2
+    assert session.total_prompt_tokens == 6
+    assert tracker.conversation_summary("a").total_calls == 0
+    assert tracker.conversation_summary("c").total_calls == 1
+    assert tracker.agent_observability("jd_agent").call_count == 2
+
+
+def test_evicted_keys_release_interned_names():
+    tracker = cost_tracker_module.CostTracker(capacity=4)
+    for i in range(1000):
+        _record(tracker, conversation_id=f"conv-{i}")
+
+    # 4 retained conversations + provider + caller
+    assert len(tracker._codes) == 6
+    assert tracker.conversation_summary("conv-999").total_calls == 1
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"prompt_tokens": "lots"},
+        {"completion_tokens": 1 << 63},
+        {"duration_ms": float("inf")},
+        {"duration_ms": float("nan")},
+    ],
+)
+def test_rejected_record_leaves_totals_untouched(overrides):
+    tracker = cost_tracker_module.CostTracker(capacity=2)
+    _record(tracker)
+    _record(tracker)
+    with pytest.raises((TypeError, ValueError, OverflowError)):
+        _record(tracker, **overrides)
+    for _ in range(3):
+        _record(tracker)
+
+    session = tracker.session_summary()
+    assert session.total_calls == 2
+    assert session.total_prompt_tokens == 200
+    assert tracker.agent_observability("jd_agent").call_count == 2
+
+
+def test_numeric_types_are_coerced():
+    tracker = cost_tracker_module.CostTracker(capacity=2)
+    record = _record(tracker, prompt_tokens=10.0, completion_tokens=5, duration_ms=3)
+
+    assert record.total_tokens == 15
+    assert tracker.session_summary().total_duration_ms == 3.0
+
+
+def test_max_latency_is_an_upper_bound():
+    tracker = cost_tracker_module.CostTracker(capacity=8)
+    _record(tracker, duration_ms=8.0)
+
+    observed = tracker.agent_observability("jd_agent")
+    assert observed.avg_latency_ms == 8.0
+    assert 8.0 <= observed.max_latency_ms <= 8.0 * 1.03